@@ -66,7 +66,8 @@ phrases, ngram2phrases = get_index(
 
 # Save index to file
 with open(args.output_name, "w", encoding="utf-8") as out:
-    for ngram in ngram2phrases:
-        for phrase_id, begin, size, logprob in ngram2phrases[ngram]:
-            phrase = phrases[phrase_id]
-            out.write(ngram + "\t" + phrase + "\t" + str(begin) + "\t" + str(size) + "\t" + str(logprob) + "\n")
+    for ngram, phrase_infos in ngram2phrases.items():
+        out.writelines(
+            "\t".join((ngram, phrases[phrase_id], str(begin), str(size), str(logprob))) + "\n"
+            for phrase_id, begin, size, logprob in phrase_infos
+        )
@@ -47,14 +47,15 @@ def filter_file(inp_filename: str, out_filename: str, error_vcb: Set) -> None:
     sent_is_ok = True
     with open(inp_filename, "r", encoding="utf-8") as f:
         for line in f:
-            sent_lines.append(line.strip())
+            line = line.strip()
+            sent_lines.append(line)
             if line.startswith("<eos>"):
                 if sent_is_ok and len(sent_lines) > 1:  # there should be at least one line except <eos>
                     out.write("\n".join(sent_lines) + "\n")
                 sent_lines = []
                 sent_is_ok = True
             else:
-                cls, written, spoken = line.strip().split("\t")
+                cls, written, spoken = line.split("\t")
                 k = (cls, spoken.casefold(), written.casefold())
                 if k in error_vcb:
                     sent_is_ok = False
@@ -19,6 +19,7 @@ to produce training corpus for the ThutmoseTaggerModel.
 """
 
 import glob
+import multiprocessing as mp
 import os
 from argparse import ArgumentParser
 from collections import Counter
@@ -46,6 +47,13 @@ parser.add_argument(
 parser.add_argument("--out_filename", required=True, type=str, help='Output file')
 parser.add_argument("--vocab_filename", required=True, type=str, help='Vocab name')
 parser.add_argument("--lang", required=True, type=str, help="Language")
+parser.add_argument(
+    "--num_workers",
+    type=int,
+    default=mp.cpu_count(),
+    help="Number of processes used to read alignment files in get_replacement_vocab mode. "
+    "By default it is equal to the number of CPU cores.",
+)
 args = parser.parse_args()
 
 
@@ -80,25 +88,23 @@ def process_file_itn(inputname: str, out: TextIO, keys2replacements: Dict[str, s
                     words.append(written.casefold())
                     tags.append("<SELF>")
                     continue
+                cls_casefolded = cls.casefold()
                 src, dst, same_begin, same_end = get_src_and_dst_for_alignment(
-                    cls.casefold(), written, spoken, args.lang
+                    cls_casefolded, written, spoken, args.lang
                 )
                 same_from_begin = [] if same_begin == "" else same_begin.split(" ")
                 same_from_end = [] if same_end == "" else same_end.split(" ")
-                key = cls.casefold() + "\t" + src + "\t" + dst
+                key = cls_casefolded + "\t" + src + "\t" + dst
                 if key in keys2replacements:
                     replacements = keys2replacements[key].split(" ")
                     spoken_words = dst.split(" ")
+                    # for LETTERS and PLAIN the replacement is compared as is, for other classes without "_"
+                    keep_underscores = cls == "LETTERS" or cls == "PLAIN"
                     for w, r in zip(
                         same_from_begin + spoken_words + same_from_end, same_from_begin + replacements + same_from_end
                     ):
                         words.append(w)
-                        if cls == "LETTERS" or cls == "PLAIN":
-                            if w == r:
-                                tags.append("<SELF>")
-                            else:
-                                tags.append(r)
-                        elif w == r.replace("_", ""):
+                        if w == (r if keep_underscores else r.replace("_", "")):
                             tags.append("<SELF>")
                         else:
                             tags.append(r)
@@ -116,12 +122,13 @@ def process_file_itn(inputname: str, out: TextIO, keys2replacements: Dict[str, s
 def process_line(semiotic_class: str, line: str) -> Optional[Tuple[str, str, str, int]]:
     """A helper function to read the file with alignment results"""
 
+    # lines with failed alignment (-mon:, -exception: etc.) are rejected before splitting
+    if "\tgood:\t" not in line:
+        return None
     parts = line.strip().split("\t")
-    if len(parts) != 6:
+    if len(parts) != 6 or parts[1] != "good:":
         return None
     freq = int(parts[0])
-    if parts[1] != "good:":
-        return None
 
     src, dst, leftside_align, rightside_align = parts[2], parts[3], parts[4], parts[5]
     align = rightside_align
@@ -131,41 +138,67 @@ def process_line(semiotic_class: str, line: str) -> Optional[Tuple[str, str, str
     return src, dst, align, freq
 
 
+def save_vocab(vocab: Counter, filename: str, batch_size: int = 1024) -> None:
+    """Writes a vocabulary sorted by frequency to file, lines are written in batches to reduce the number of calls"""
+
+    with open(filename, "w", encoding="utf-8", buffering=1 << 20) as out:
+        batch = []
+        for k, v in vocab.most_common(1000000000):
+            batch.append(k + "\t" + str(v) + "\n")
+            if len(batch) >= batch_size:
+                out.writelines(batch)
+                batch = []
+        out.writelines(batch)
+
+
+def get_class_replacement_vocab(fn: str) -> Tuple[str, Counter]:
+    """Counts frequencies of different replacement segments in one file with alignment results
+
+    Args:
+        fn: name of alignment file inside a semiotic class subfolder
+
+    Returns:
+        semiotic class (name of the subfolder) and Counter of replacement frequencies
+    """
+
+    fn_parts = fn.split("/")
+    if len(fn_parts) < 2:
+        raise ValueError("Bad filename: " + fn)
+    semiotic_class = fn_parts[-2]
+    class_vocab = Counter()
+    with open(fn, "r", encoding="utf-8") as f:
+        for line in f:
+            t = process_line(semiotic_class, line)
+            if t is None:
+                continue
+            src, dst, replacement, freq = t
+            inputs = src.split(" ")
+            replacements = replacement.split(" ")
+            if len(inputs) != len(replacements):
+                raise ValueError("Length mismatch in: " + line)
+            for inp, rep in zip(inputs, replacements):
+                if inp == rep:  # skip same words
+                    continue
+                class_vocab[rep] += freq
+    return semiotic_class, class_vocab
+
+
 def get_replacement_vocab() -> None:
     """Loops through the files with alignment results in each semiotic class subfolder, counts frequencies of different
      replacement segments.
+     The files are processed in parallel by a pool of args.num_workers processes.
     """
 
     full_vocab = Counter()
     alignment_files = glob.glob(args.giza_dir + "/*/" + args.alignment_filename)
-    for fn in alignment_files:
-        fn_parts = fn.split("/")
-        if len(fn_parts) < 2:
-            raise ValueError("Bad filename: " + fn)
-        semiotic_class = fn_parts[-2]
-        class_vocab = Counter()
-        with open(fn, "r", encoding="utf-8") as f:
-            for line in f:
-                t = process_line(semiotic_class, line)
-                if t is None:
-                    continue
-                src, dst, replacement, freq = t
-                inputs = src.split(" ")
-                replacements = replacement.split(" ")
-                if len(inputs) != len(replacements):
-                    raise ValueError("Length mismatch in: " + line)
-                for inp, rep in zip(inputs, replacements):
-                    if inp == rep:  # skip same words
-                        continue
-                    full_vocab[rep] += freq
-                    class_vocab[rep] += freq
-        with open(args.vocab_filename + "." + semiotic_class, "w", encoding="utf-8") as out:
-            for k, v in class_vocab.most_common(1000000000):
-                out.write(k + "\t" + str(v) + "\n")
-
-    with open(args.vocab_filename, "w", encoding="utf-8") as out:
-        for k, v in full_vocab.most_common(1000000000):
-            out.write(k + "\t" + str(v) + "\n")
+    with mp.Pool(max(1, min(args.num_workers, len(alignment_files)))) as pool:
+        # imap keeps the order of files, so that the resulting vocabulary does not depend on scheduling of workers
+        for semiotic_class, class_vocab in pool.imap(get_class_replacement_vocab, alignment_files):
+            # merge once per file instead of updating both counters for each replacement
+            full_vocab.update(class_vocab)
+            save_vocab(class_vocab, args.vocab_filename + "." + semiotic_class)
+
+    save_vocab(full_vocab, args.vocab_filename)
 
 
 def filter_by_vocab() -> None:
@@ -189,7 +222,9 @@ def filter_by_vocab() -> None:
         if len(fn_parts) < 2:
             raise ValueError("Bad filename: " + fn)
         semiotic_class = fn_parts[-2]
-        out = open(args.giza_dir + "/" + semiotic_class + "/" + args.out_filename, "w", encoding="utf-8")
+        out = open(
+            args.giza_dir + "/" + semiotic_class + "/" + args.out_filename, "w", encoding="utf-8", buffering=1 << 20
+        )
         with open(fn, "r", encoding="utf-8") as f:
             for line in f:
                 t = process_line(semiotic_class, line)
@@ -201,7 +236,7 @@ def filter_by_vocab() -> None:
                     if s != r and r not in vocab:
                         ok = False
                 if ok:
-                    out.write(semiotic_class + "\t" + src + "\t" + dst + "\t" + replacement + "\n")
+                    out.write("\t".join((semiotic_class, src, dst, replacement)) + "\n")
         out.close()
 
 
@@ -229,7 +264,7 @@ def get_labeled_corpus() -> None:
                     logging.warning("keys2replacements[key] != replacements", keys2replacements[key], replacements)
                 keys2replacements[key] = replacements
     print("size of phrase-to-replacements dictionary =", len(keys2replacements))
-    out = open(args.out_filename, "w", encoding="utf-8")
+    out = open(args.out_filename, "w", encoding="utf-8", buffering=1 << 20)
     input_paths = sorted([os.path.join(args.data_dir, f) for f in os.listdir(args.data_dir)])
     for inputname in input_paths:
         process_file_itn(inputname, out, keys2replacements)
@@ -29,22 +29,21 @@ args = parser.parse_args()
 
 vocab = Counter()
 
-out_sample = open(args.filename + ".sample_" + str(args.max_count), "w", encoding="utf-8")
-out_rest = open(args.filename + ".rest_" + str(args.max_count), "w", encoding="utf-8")
+out_sample = open(args.filename + ".sample_" + str(args.max_count), "w", encoding="utf-8", buffering=1 << 20)
+out_rest = open(args.filename + ".rest_" + str(args.max_count), "w", encoding="utf-8", buffering=1 << 20)
 
 n = 0
 with open(args.filename, "r", encoding="utf-8") as f:
     for line in f:
-        parts = line.strip().split("\t")
-        if len(parts) < 2:
+        # only the second column (tags) is needed, so there is no need to split the whole line
+        _, sep, rest = line.strip().partition("\t")
+        if sep == "":
             print("Warning: bad format in line: " + str(n) + ": " + line, file=sys.stderr)
             continue
 
-        tags = parts[1].split(" ")
+        tags = rest.partition("\t")[0].split(" ")
         ok = False
         for t in tags:
-            if t not in vocab:
-                vocab[t] = 0
             if vocab[t] < args.max_count:
                 ok = True
                 vocab[t] += 1
@@ -60,19 +60,18 @@ if __name__ == '__main__':
     f_ref = open(args.reference_file, "r", encoding="utf-8")
     f_infer = open(args.inference_file, "r", encoding="utf-8")
     f_out = open(args.output_file, "w", encoding="utf-8")
-    lines_ref = f_ref.readlines()
-    lines_infer = f_infer.readlines()
-    f_ref.close()
-    f_infer.close()
-    if len(lines_ref) != len(lines_infer):
+    # count lines in a cheap first pass, so that a mismatch is reported before any report is written
+    len_ref = sum(1 for _ in f_ref)
+    len_infer = sum(1 for _ in f_infer)
+    if len_ref != len_infer:
         raise ValueError(
-            "Number of lines doesn't match: len(lines_ref)="
-            + str(len(lines_ref))
-            + "; len(lines_infer)="
-            + str(len(lines_infer))
+            "Number of lines doesn't match: len(lines_ref)=" + str(len_ref) + "; len(lines_infer)=" + str(len_infer)
         )
-    for i in range(len(lines_infer)):
-        _, inp_str, _, tag_with_swap_str, semiotic = lines_infer[i].strip().split("\t")
+    f_ref.seek(0)
+    f_infer.seek(0)
+    # read both files line by line instead of loading them to memory
+    for line_ref, line_infer in zip(f_ref, f_infer):
+        _, inp_str, _, tag_with_swap_str, semiotic = line_infer.strip().split("\t")
         input_words = inp_str.split(" ")
         predicted_tags = tag_with_swap_str.split(" ")
         predicted_words = predicted_tags[:]
@@ -85,9 +84,9 @@ if __name__ == '__main__':
             else:
                 predicted_words[k] = predicted_words[k].replace(">", "").replace("<", "")
 
-        parts = lines_ref[i].strip().split("\t")
+        parts = line_ref.strip().split("\t")
         if len(parts) < 2 or len(parts) > 3:
-            raise ValueError("Bad format: " + lines_ref[i])
+            raise ValueError("Bad format: " + line_ref)
         if len(parts) == 3:  # there are non-trivial semiotic spans
             spans = parts[2].split(";")
             for span in spans:
@@ -95,7 +94,7 @@ if __name__ == '__main__':
                 try:
                     sem, begin, end = span_parts[0].split(" ")
                 except Exception:
-                    print("error: ", lines_ref[i])
+                    print("error: ", line_ref)
                     continue
                 begin = int(begin)
                 end = int(end)
@@ -128,6 +127,9 @@ if __name__ == '__main__':
                     out_sem.write("\tref=" + parts[1] + "\n")
                     out_sem.close()
 
+    f_ref.close()
+    f_infer.close()
+
     f_out.write("class\ttotal\tcorrect\terrors\taccuracy\n")
     for sem in total_count:
         f_out.write(
@@ -17,7 +17,7 @@
 This script can be used to construct a vocabulary of multiple references
 """
 from argparse import ArgumentParser
-from collections import Counter
+from collections import Counter, defaultdict
 from os import listdir
 
 from nemo.collections.nlp.data.text_normalization_as_tagging.utils import spoken_preprocessing
@@ -29,7 +29,7 @@ args = parser.parse_args()
 
 if __name__ == "__main__":
 
-    vcb = {}
+    vcb = defaultdict(Counter)
     filenames = []
     for fn in listdir(args.data_dir + "/train"):
         filenames.append(args.data_dir + "/train/" + fn)
@@ -52,13 +52,10 @@ if __name__ == "__main__":
                     continue
                 if len(spoken.split(" ")) >= 100:
                     continue
-                k = (semiotic_class, spoken)
-                if k not in vcb:
-                    vcb[k] = Counter()
-                vcb[k][written] += 1
+                vcb[(semiotic_class, spoken)][written] += 1
 
     with open(args.out_filename, "w", encoding="utf-8") as out:
-        for sem, spoken in vcb:
-            for written in vcb[(sem, spoken)]:
-                out.write(sem + "\t" + spoken + "\t" + written + "\t" + str(vcb[(sem, spoken)][written]) + "\n")
+        for (sem, spoken), written_vcb in vcb.items():
+            for written, freq in written_vcb.items():
+                out.write(sem + "\t" + spoken + "\t" + written + "\t" + str(freq) + "\n")
             out.write(sem + "\t" + spoken + "\t" + spoken + "\t1\n")
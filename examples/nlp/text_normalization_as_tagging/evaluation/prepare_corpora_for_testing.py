@@ -63,8 +63,9 @@ def process_file(
                 raw_lines = []
                 sent_ok = True if args.sampling_count == -1 else False
             else:
-                raw_lines.append(line.strip())
-                cls, written, spoken = line.strip().split("\t")
+                line = line.strip()
+                raw_lines.append(line)
+                cls, written, spoken = line.split("\t")
                 spoken = spoken_preprocessing(spoken)
                 written = written.casefold()
                 references = set()
@@ -120,8 +121,6 @@ def process_file(
                 )
                 reference_words.append(written.casefold())
 
-                if cls not in sampling_vcb:
-                    sampling_vcb[cls] = 0
                 if sampling_vcb[cls] < args.sampling_count:
                     sent_ok = True
                     sampling_vcb[cls] += 1
@@ -38,6 +38,9 @@ line arguments by `--config-name=CONFIG_FILE_PATH'.
 
 
 import os
+import queue
+import threading
+from itertools import islice
 
 from helpers import ITN_MODEL, instantiate_model_and_trainer
 from omegaconf import DictConfig, OmegaConf
@@ -47,6 +50,36 @@ from nemo.core.config import hydra_runner
 from nemo.utils import logging
 
 
+def produce_batches(input_name: str, batch_size: int, sort_window: int, batch_queue: queue.Queue) -> None:
+    """Reads and preprocesses input lines and puts ready batches to the queue.
+    At the end the total number of read lines is put to the queue, or the exception if reading failed.
+
+    Args:
+        input_name: input file, each line is a single example for inference
+        batch_size: maximum number of sentences in a batch
+        sort_window: number of consecutive lines that are sorted by length before forming batches
+        batch_queue: queue receiving tuples (list of line indices, list of preprocessed sentences)
+    """
+    try:
+        line_count = 0
+        with open(input_name, "r", encoding="utf-8") as f:
+            # batches are formed from sentences sorted by length within a window to reduce padding
+            while True:
+                window = list(islice(f, sort_window))
+                if len(window) == 0:
+                    break
+                order = sorted(range(len(window)), key=lambda i: len(window[i]))
+                for start in range(0, len(order), batch_size):
+                    batch_ids = order[start : start + batch_size]
+                    # this is the same input transformation as in corpus preparation
+                    batch = [spoken_preprocessing(window[i]).strip() for i in batch_ids]
+                    batch_queue.put(([line_count + i for i in batch_ids], batch))
+                line_count += len(window)
+        batch_queue.put(line_count)
+    except Exception as e:
+        batch_queue.put(e)
+
+
 @hydra_runner(config_path="conf", config_name="thutmose_tagger_itn_config")
 def main(cfg: DictConfig) -> None:
     logging.debug(f'Config Params: {OmegaConf.to_yaml(cfg)}')
@@ -60,30 +93,52 @@ def main(cfg: DictConfig) -> None:
     if not os.path.exists(text_file):
         raise ValueError(f"{text_file} not found.")
 
-    with open(text_file, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
     batch_size = cfg.inference.get("batch_size", 8)
+    sort_window = cfg.inference.get("sort_window", 4096)
+    if batch_size < 1:
+        raise ValueError(f"inference.batch_size should be positive, got {batch_size}")
+    if sort_window < 1:
+        raise ValueError(f"inference.sort_window should be positive, got {sort_window}")
+    out_file = cfg.inference.out_file
 
-    batch, all_preds = [], []
-    for i, line in enumerate(lines):
-        s = spoken_preprocessing(line)  # this is the same input transformation as in corpus preparation
-        batch.append(s.strip())
-        if len(batch) == batch_size or i == len(lines) - 1:
+    # batches are prepared in a separate thread, so that preprocessing overlaps with model inference
+    batch_queue = queue.Queue(maxsize=4)
+    producer = threading.Thread(
+        target=produce_batches, args=(text_file, batch_size, sort_window, batch_queue), daemon=True
+    )
+    producer.start()
+
+    # predictions are written as soon as all previous lines are predicted, only the current window is kept in memory
+    pending_preds = {}
+    next_id = 0
+    pred_count = 0
+    with open(f"{out_file}", "w", encoding="utf-8", buffering=1 << 20) as f_out:
+        while True:
+            item = batch_queue.get()
+            if isinstance(item, Exception):
+                raise item
+            if isinstance(item, int):
+                line_count = item
+                break
+            batch_ids, batch = item
             outputs = model._infer(batch)
-            for x in outputs:
-                all_preds.append(x)
-            batch = []
-    if len(all_preds) != len(lines):
+            pred_count += len(outputs)
+            pending_preds.update(zip(batch_ids, outputs))
+            ready_preds = []
+            while next_id in pending_preds:
+                ready_preds.append(pending_preds.pop(next_id))
+                next_id += 1
+            if len(ready_preds) > 0:
+                f_out.write("\n".join(ready_preds))
+                f_out.write("\n")
+    producer.join()
+    if pred_count != line_count:
         raise ValueError(
             "number of input lines and predictions is different: predictions="
-            + str(len(all_preds))
+            + str(pred_count)
             + "; lines="
-            + str(len(lines))
+            + str(line_count)
         )
-    out_file = cfg.inference.out_file
-    with open(f"{out_file}", "w", encoding="utf-8") as f_out:
-        f_out.write("\n".join(all_preds))
     logging.info(f"Predictions saved to {out_file}.")
 
 
@@ -13,11 +13,13 @@
 # limitations under the License.
 
 
+import heapq
 import json
 import math
 import random
 import re
 from collections import defaultdict, namedtuple
+from operator import itemgetter
 from typing import Dict, List, Set, Tuple, Union
 
 import numpy as np
@@ -25,6 +27,12 @@ from numba import jit
 
 """Utility functions for Spellchecking ASR Customization."""
 
+# translation tables for single-character substitutions, they are applied in one pass instead of chained str.replace
+# "+" joins letters and "=" marks deletion in misspelled ngrams of the n-gram mappings vocabulary
+NGRAM_JOINS_TO_SPACE = str.maketrans({"+": " ", "=": " "})
+# letters separated by space, real space replaced by underscore => plain text
+SPACED_LETTERS_TO_TEXT = str.maketrans({" ": "", "_": " "})
+
 
 def replace_diacritics(text):
     text = re.sub(r"[éèëēêęěė]", "e", text)  # latin
@@ -251,7 +259,8 @@ def get_index(
 
     Args:
         custom_phrases: list of all custom phrases, characters should be split by space,  real space replaced to underscore.
-        vocab: n-gram mappings vocabulary - dict {key=original_ngram, value=dict{key=misspelled_ngram, value=frequency}}
+        vocab: n-gram mappings vocabulary - dict {key=original_ngram, value=dict{key=misspelled_ngram, value=prob}}.
+            prob=joint_freq/orig_freq, as produced by load_ngram_mappings, so it should not exceed 1.
         ban_ngram_global: set of banned misspelled n-grams
         min_log_prob: minimum log probability, after which we stop growing this n-gram.
         max_phrases_per_ngram: maximum phrases that we allow to store per one n-gram. N-grams exceeding that quantity get banned.
@@ -263,45 +272,58 @@ def get_index(
 
     ban_ngram_local = set()  # these ngrams are banned only for given custom_phrases
     ngram_to_phrase_and_position = defaultdict(list)
+    log = math.log
 
     for custom_phrase in custom_phrases:
         inputs = custom_phrase.split(" ")
         begin = 0
-        index_keys = [{} for _ in inputs]  # key - letter ngram, index - beginning positions in phrase
-
-        for begin in range(len(inputs)):
-            for end in range(begin + 1, min(len(inputs) + 1, begin + 5)):
-                inp = " ".join(inputs[begin:end])
+        # key - letter ngram, value - (logprob, number of tokens), index - beginning positions in phrase
+        index_keys = [{} for _ in inputs]
+
+        inputs_len = len(inputs)
+        # starting positions of tokens in custom_phrase, used to cut ngrams from it without joining sublists
+        offsets = [0]
+        for token in inputs:
+            offsets.append(offsets[-1] + len(token) + 1)
+        for begin in range(inputs_len):
+            for end in range(begin + 1, min(inputs_len + 1, begin + 5)):
+                inp = custom_phrase[offsets[begin] : offsets[end] - 1]
                 if inp not in vocab:
                     continue
-                for rep in vocab[inp]:
-                    lp = math.log(vocab[inp][rep])
+                # bind loop-invariant lookups to locals, this loop is the bottleneck of index creation
+                for rep, prob in vocab[inp].items():
+                    lp = log(prob)
+                    # logprobs are not positive (probabilities are <= 1),
+                    # so neither this replacement nor its joins with previous ngrams can pass
+                    if lp <= min_log_prob:
+                        continue
+                    rep_len = len(rep)
+                    rep_nspaces = rep.count(" ") + 1
 
                     for b in range(max(0, end - 5), end):  # try to grow previous ngrams with new replacement
+                        ik_b = index_keys[b]
                         new_ngrams = {}
-                        for ngram in index_keys[b]:
-                            lp_prev = index_keys[b][ngram]
-                            if len(ngram) + len(rep) <= 10 and b + ngram.count(" ") == begin:
+                        for ngram, (lp_prev, nspaces) in ik_b.items():
+                            if len(ngram) + rep_len <= 10 and b + nspaces == begin:
                                 if lp_prev + lp > min_log_prob:
-                                    new_ngrams[ngram + rep + " "] = lp_prev + lp
-                        index_keys[b].update(new_ngrams)  #  join two dictionaries
+                                    new_ngrams[ngram + rep + " "] = (lp_prev + lp, nspaces + rep_nspaces)
+                        ik_b.update(new_ngrams)  #  join two dictionaries
                     # add current replacement as ngram
-                    if lp > min_log_prob:
-                        index_keys[begin][rep + " "] = lp
+                    index_keys[begin][rep + " "] = (lp, rep_nspaces)
 
         for b in range(len(index_keys)):
-            for ngram, lp in sorted(index_keys[b].items(), key=lambda item: item[1], reverse=True):
+            for ngram, (lp, real_length) in sorted(index_keys[b].items(), key=lambda item: item[1][0], reverse=True):
                 if ngram in ban_ngram_global:  # here ngram ends with a space
                     continue
-                real_length = ngram.count(" ")
-                ngram = ngram.replace("+", " ").replace("=", " ")
+                ngram = ngram.translate(NGRAM_JOINS_TO_SPACE)
                 ngram = " ".join(ngram.split())  # here ngram doesn't end with a space anymore
                 if ngram + " " in ban_ngram_global:  # this can happen after deletion of + and =
                     continue
                 if ngram in ban_ngram_local:
                     continue
-                ngram_to_phrase_and_position[ngram].append((custom_phrase, b, real_length, lp))
-                if len(ngram_to_phrase_and_position[ngram]) > max_phrases_per_ngram:
+                phrase_list = ngram_to_phrase_and_position[ngram]
+                phrase_list.append((custom_phrase, b, real_length, lp))
+                if len(phrase_list) > max_phrases_per_ngram:
                     ban_ngram_local.add(ngram)
                     del ngram_to_phrase_and_position[ngram]
                     continue
@@ -369,10 +391,14 @@ def search_in_index(
     # positions mapped to sets of ngrams starting from that position
     position2ngrams = [set() for _ in range(len(letters))]
 
-    begin = 0
+    # starting positions of letters in the joined string, used to cut ngrams from it without joining sublists
+    joined_letters = " ".join(letters)
+    offsets = [0]
+    for letter in letters:
+        offsets.append(offsets[-1] + len(letter) + 1)
     for begin in range(len(letters)):
         for end in range(begin + 1, min(len(letters) + 1, begin + 7)):
-            ngram = " ".join(letters[begin:end])
+            ngram = joined_letters[offsets[begin] : offsets[end] - 1]
             if ngram not in ngram2phrases:
                 continue
             for phrase_id, b, size, lp in ngram2phrases[ngram]:
@@ -442,7 +468,8 @@ def get_candidates(
     phrases2coveredsymbols = [[0 for x in phrases[i].split(" ")] for i in range(len(phrases))]
     candidates = []
     k = 0
-    for idx, coverage in sorted(enumerate(candidate2coverage), key=lambda item: item[1], reverse=True):
+    # the loop below stops after 101 iterations (see k > 100), so there is no need to sort the whole list
+    for idx, coverage in heapq.nlargest(101, enumerate(candidate2coverage), key=itemgetter(1)):
         begin = candidate2position[idx]  # this is most likely beginning of this candidate
         phrase_length = phrases[idx].count(" ") + 1
         for pos in range(begin, begin + phrase_length):
@@ -496,8 +523,8 @@ def read_spellmapper_predictions(filename: str) -> List[Tuple[str, List[Tuple[in
     with open(filename, "r", encoding="utf-8") as f:
         for line in f:
             text, candidate_str, fragment_predictions_str, letter_predictions_str = line.strip().split("\t")
-            text = text.replace(" ", "").replace("_", " ")
-            candidate_str = candidate_str.replace(" ", "").replace("_", " ")
+            text = text.translate(SPACED_LETTERS_TO_TEXT)
+            candidate_str = candidate_str.translate(SPACED_LETTERS_TO_TEXT)
             candidates = candidate_str.split(";")
             letter_predictions = list(map(int, letter_predictions_str.split()))
             if len(candidates) != 10:
@@ -18,6 +18,8 @@ from transformers import AutoTokenizer
 from nemo.collections.nlp.data.spellchecking_asr_customization.bert_example import BertExampleBuilder
 from nemo.collections.nlp.data.spellchecking_asr_customization.utils import (
     apply_replacements_to_text,
+    get_index,
+    search_in_index,
     substitute_replacements_in_text,
 )
 
@@ -65,6 +67,46 @@ def test_apply_replacements_to_text():
     assert corrected_text == gold_text
 
 
+@pytest.mark.unit
+def test_get_index_and_search_in_index():
+    vocab = {"a": {"a": 0.8, "e": 0.2}, "b": {"b": 0.9, "=": 0.1}, "c": {"c": 0.7, "k+s": 0.3}}
+    custom_phrases = ["a b c", "c a b", "b a"]
+    # "e b" is banned globally, single letters are banned locally as they index more than 2 phrase positions,
+    # "e k s" (from "a b c" -> "e = k+s") is pruned by min_log_prob
+    phrases, ngram2phrases = get_index(custom_phrases, vocab, {"e b "}, max_phrases_per_ngram=2)
+    assert phrases == custom_phrases
+    gold_ngram2phrases = {
+        "a b": [(0, 0, 2, -0.3285), (1, 1, 2, -0.3285)],
+        "a b c": [(0, 0, 3, -0.6852)],
+        "a b k s": [(0, 0, 3, -1.5325)],
+        "e b c": [(0, 0, 3, -2.0715)],
+        "a c": [(0, 0, 3, -2.8824)],
+        "e b k s": [(0, 0, 3, -2.9188)],
+        "a k s": [(0, 0, 3, -3.7297)],
+        "b c": [(0, 1, 2, -0.462)],
+        "b k s": [(0, 1, 2, -1.3093)],
+        "c a": [(1, 0, 2, -0.5798), (1, 0, 3, -2.8824)],
+        "c a b": [(1, 0, 3, -0.6852)],
+        "k s a": [(1, 0, 2, -1.4271), (1, 0, 3, -3.7297)],
+        "k s a b": [(1, 0, 3, -1.5325)],
+        "c e": [(1, 0, 2, -1.9661)],
+        "c e b": [(1, 0, 3, -2.0715)],
+        "k s e": [(1, 0, 2, -2.8134)],
+        "k s e b": [(1, 0, 3, -2.9188)],
+        "b a": [(2, 0, 2, -0.3285)],
+        "b e": [(2, 0, 2, -1.7148)],
+    }
+    rounded_ngram2phrases = {
+        ngram: [(phrase_id, begin, size, round(lp, 4)) for phrase_id, begin, size, lp in entries]
+        for ngram, entries in ngram2phrases.items()
+    }
+    assert list(rounded_ngram2phrases.items()) == list(gold_ngram2phrases.items())
+
+    phrases2positions, position2ngrams = search_in_index(ngram2phrases, phrases, ["k", "s", "a", "b"])
+    assert phrases2positions.tolist() == [[0.0, 0.0, 1.0, 1.0], [1.0, 1.0, 1.0, 1.0], [0.0, 0.0, 0.0, 0.0]]
+    assert position2ngrams == [{"k s a", "k s a b"}, set(), {"a b"}, set()]
+
+
 @pytest.fixture()
 def bert_example_builder():
     tokenizer = AutoTokenizer.from_pretrained("huawei-noah/TinyBERT_General_6L_768D")